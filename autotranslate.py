@@ -3,15 +3,25 @@
 import deepl                                     # pip3 install --upgrade deepl  # https://github.com/DeepLcom/deepl-python#configuration
 from pypdf import PdfReader, PdfWriter           # pip3 install pypdf
 from unidecode import unidecode                  # pip3 install unidecode
-from dateutil.relativedelta import relativedelta # pip3 install python-dateutil
-import translators as ts                         # pip3 install --upgrade translators  # https://github.com/UlionTse/translators (this is a real PITA to install, you need to install Node.js in apt-get and then pip needs to recompile the cryptography package)
-import langdetect                                # pip3 install langdetect  # https://pypi.org/project/langdetect/
+# translators & langdetect are only imported if TRANSLATE_FILENAME is set, see translateText() & detectLanguage()
+from watchdog.observers import Observer          # pip3 install watchdog  # https://github.com/gorakhargosh/watchdog
+from watchdog.observers.polling import PollingObserver
+from watchdog.events import FileSystemEventHandler
 from datetime import datetime,timedelta          # https://docs.python.org/3/library/datetime.html
 import logging, logging.handlers                 # https://docs.python.org/3/howto/logging.html
+import atexit
+import bisect
+import calendar
+import concurrent.futures
+import hashlib
 import os
+import queue
 import re                                        # https://docs.python.org/3/library/re.html?highlight=re#module-re
+import shutil
+import signal
 import string
 import sys
+import threading
 import time
 
 
@@ -25,20 +35,33 @@ def translateDocument(inputDocument, outputDocument, targetLang):
   # originally copied from https://github.com/DeepLcom/deepl-python#translating-documents
 
   logger.info(f'Uploading file to DeepL web API translation service.')
-  logger.debug(f"\tinput document:  {inputDocument}")
-  logger.debug(f"\toutput document: {outputDocument}")
-  logger.debug(f"\ttarget language: {targetLang}")
+  logger.debug("\tinput document:  %s", inputDocument)
+  logger.debug("\toutput document: %s", outputDocument)
+  logger.debug("\ttarget language: %s", targetLang)
   
-  global wasQuotaExceeded
+  global wasQuotaExceeded, wasRateLimited
   retVal = False
   try:
-    # Using translate_document_from_filepath() with file paths 
-    result = translator.translate_document_from_filepath(
-        inputDocument,
-        outputDocument,
-        target_lang=targetLang,
-        formality="prefer_more"
-    )
+    # upload, wait & download as separate steps (rather than translate_document_from_filepath()) so the status is polled with a backoff, instead of every 5 secs
+    with open(inputDocument, "rb") as inFile:
+      handle = translator.translate_document_upload(
+          inFile,
+          target_lang=targetLang,
+          formality="prefer_more"
+      )
+    try:
+      status = waitForDocumentTranslation(handle)
+      if status.ok:
+        with open(outputDocument, "wb") as outFile:
+          translator.translate_document_download(handle, outFile)
+    except Exception as error:
+      try:
+        os.remove(outputDocument) # don't leave a half-downloaded document lying around for appendPDFs()
+      except OSError:
+        pass
+      raise deepl.DocumentTranslationException(str(error), handle) from error # same as translate_document_from_filepath() does, so the handling below still works
+    if not status.ok:
+      raise deepl.DocumentTranslationException(f"Error occurred while translating document: {status.error_message or 'unknown error'}", handle)
 
     # # Alternatively you can use translate_document() with file IO objects
     # with open(inputDocument, "rb") as in_file, open(outputDocument, "wb") as out_file:
@@ -66,31 +89,129 @@ def translateDocument(inputDocument, outputDocument, targetLang):
     tmpStr = ', document handle: ' + docHNDL
     errMsg = str(error).replace(tmpStr, '.')    # DocumentTranslationException doesn't have a `message` attribute, so we'll make one
     logger.error(f"\t{errMsg}")
-    p = re.compile('Document ID:\s+(\w+), key:\s+(\w+)')  # finish pulling the ID and key
-    m = p.match(docHNDL)
-    docID = m[1]
-    docKey = m[2]
+    docID = error.document_handle.document_id   # the handle already has the ID and key, no need to RegEx them out of docHNDL
+    docKey = error.document_handle.document_key
     logger.error(f"\tDocument ID:  {docID}")
     logger.error(f"\tDocument Key: {docKey}")
-    doc_id = error.document_handle.id
-    doc_key = error.document_handle.key
-    logger.error(f"\tDocument ID2:  {doc_id}")
-    logger.error(f"\tDocument Key2: {doc_key}")
     if errMsg == "Quota for this billing period has been exceeded.": # the error was that the quota was not empty, but still too low (note having to add the `.` because we added it in replace() above
       wasQuotaExceeded = True
   except deepl.exceptions.QuotaExceededException as error:
     wasQuotaExceeded = True
     logger.error("The quota for this billing period has been exceeded.")
     logger.error(f"{error}")
+  except deepl.TooManyRequestsException as error:
+    # the deepl library already retried with its own backoff before giving up, so stop sending files until the next scan
+    wasRateLimited = True
+    logger.error("DeepL is receiving too many requests, the remaining files will wait for the next check of the directory.")
+    logger.error(f"{error}")
+  except FileNotFoundError as error:
+    # the input file vanished (or the rename failed), open() tells us so there's no need to check beforehand
+    logger.error("Input file does not exist.")
+    logger.error(f"\t{inputDocument}")
   except Exception as error:
     # Errors during upload raise a DeepLException
     logger.error("Unknown error occurred during the translation process.")
     errorType = type(error)
-    logger.debug(f"{errorType}")
+    logger.debug("%s", errorType)
     logger.error(f"{error}")
    
   return retVal
 
+def waitForDocumentTranslation(handle):
+  # polls DeepL until it is done with the document, backing off 1s, 2s, 4s, ... up to 30s between checks
+  # (small documents are noticed as soon as they are done, big ones aren't asked about every few seconds)
+  # @return The final deepl.DocumentStatus
+  pollSecs = 1
+  status = translator.translate_document_get_status(handle)
+  while status.ok and not status.done:
+    if shutdownEvent.wait(pollSecs): # the program is exiting, stop waiting (the error reports the document ID & key, so the translation can still be fetched)
+      raise deepl.DeepLException("Program is exiting, stopped waiting for the translation") # translateDocument() adds the handle to it
+    pollSecs = min(pollSecs * 2, 30)
+    status = translator.translate_document_get_status(handle)
+  return status
+
+def getFileHash(filename):
+  # SHA-256 of the file's contents, read in 1MB chunks so a big PDF isn't pulled into memory in one go
+  sha = hashlib.sha256()
+  with open(filename, "rb") as f:
+    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+      sha.update(chunk)
+  return sha.hexdigest()
+
+def getCachedTranslationName(inputDocument, targetLang):
+  # the cached translation's filename is the hash of the un-translated document + the target language
+  if cacheDir is None:
+    return None
+  try:
+    return os.path.join(cacheDir, getFileHash(inputDocument) + "_" + targetLang + ".pdf")
+  except OSError: # the input file is missing, translateDocument() will report it
+    return None
+
+def getCachedTranslation(cachedDocument, outputDocument):
+  # if this document has already been translated, copy the cached translation instead of spending DeepL quota on it again
+  if cachedDocument is None:
+    return False
+  try:
+    shutil.copyfile(cachedDocument, outputDocument)
+    os.utime(cachedDocument) # mark it as recently used, so it is the last to be evicted
+  except OSError: # not cached
+    return False
+  logger.info(f'Document was already translated, using the cached translation (no DeepL quota used).')
+  logger.debug("\tcached document: %s", cachedDocument)
+  return True
+
+def cacheTranslation(translatedDocument, cachedDocument):
+  # keep a copy of the (successfully merged) translation in case the same document shows up again (e.g., a copy, or the file couldn't be deleted from the inputDir)
+  if cachedDocument is None:
+    return
+  tmpCachedDocument = f"{cachedDocument}.{threading.get_ident()}.tmp" # copied under a temporary name & then swapped in, so a full disk or a kill mid-copy can't leave a truncated translation in the cache
+  try:
+    shutil.copyfile(translatedDocument, tmpCachedDocument)
+    os.replace(tmpCachedDocument, cachedDocument)
+    # evict the least recently used translations (not the temporary files, another thread may still be copying those)
+    with os.scandir(cacheDir) as entries:
+      cachedDocuments = sorted((entry for entry in entries if entry.name.endswith(".pdf") and entry.is_file()), key=lambda entry: entry.stat().st_mtime)
+    for entry in cachedDocuments[:-maxCachedTranslations]:
+      try:
+        os.remove(entry.path)
+      except FileNotFoundError: # another thread already evicted it
+        pass
+  except OSError as error:
+    try:
+      os.remove(tmpCachedDocument)
+    except OSError:
+      pass
+    logger.warning(f"Unable to cache the translated document.")
+    logger.warning(f"\t{error}")
+
+def removeCachedTranslation(cachedDocument):
+  # drops a cached translation that couldn't be merged, so the next pass sends the document to DeepL again rather than re-using it forever
+  try:
+    os.remove(cachedDocument)
+    logger.info(f'Removed the cached translation, the document will be translated again.')
+  except OSError:
+    pass
+
+def translateText(text):
+  # translates text via the translators web page API, trying each translator in turn until one works
+  # this is a bit (really) fragile.  It deliberately doesn't use the DeepL translation engine and the quota thereof.
+  import translators as ts  # pip3 install --upgrade translators  # https://github.com/UlionTse/translators (this is a real PITA to install, you need to install Node.js in apt-get and then pip needs to recompile the cryptography package)
+  lastError = None
+  for selectedTranslator in filenameTranslators:
+    try:
+      return ts.translate_text(text, translator=selectedTranslator, to_language=targetLangShort)
+    except Exception as error:
+      lastError = error
+  raise lastError
+
+def detectLanguage(text):
+  # best guess at the language of the text, only used to make the log output pretty
+  try:
+    import langdetect  # pip3 install langdetect  # https://pypi.org/project/langdetect/
+    return langdetect.detect(text)
+  except Exception as error:
+    return "??"
+
 def getTranslatedFilename(filename):
   # translates the input filename
   
@@ -106,27 +227,14 @@ def getTranslatedFilename(filename):
   if filename_new != filename:
     didFilenameHaveUnderscores = True
   
-  try:
-    origLang = langdetect.detect(filename_new)
-  except Exception as error:
-    origLang = "??"
+  origLang = detectLanguage(filename_new)
   logger.info(f"\t{origLang.upper()} -> {filename}")
     
-  try: # multiple failure levels of translators []
-    selectedTranslator = 'google' # Google is better but I don't trust them to not screw with their webpage and break the translators API
-    transText = ts.translate_text(filename_new, translator=selectedTranslator, to_language=targetLangShort)
+  try:
+    transText = translateText(filename_new)
   except Exception as error:
-    try:
-      selectedTranslator = 'bing' # Bing is the translators API default tool
-      transText = ts.translate_text(filename_new, translator=selectedTranslator, to_language=targetLangShort)
-    except Exception as error:
-      try:
-        selectedTranslator = 'deepl' # DeepL is what the rest of the program uses but the free version tends to error on a captcha
-        transText = ts.translate_text(filename_new, translator=selectedTranslator, to_language=targetLangShort)
-      except Exception as error:
-        logger.error("\tUnknown error occurred during the filename translator.")
-        logger.error(f"\t{error}")
-  # logger.error(f"\t{selectedTranslator}")
+    logger.error("\tUnknown error occurred during the filename translator.")
+    logger.error(f"\t{error}")
 
   if didFilenameHaveUnderscores: # undo the replacement of underscores/spaces
     transText = transText.replace(" ", "_")
@@ -134,6 +242,62 @@ def getTranslatedFilename(filename):
   logger.info(f"\t{targetLangShort.upper()} -> {transText}")
   return transText
 
+def getTranslatedFilenames(filenames):
+  # translates a batch of filenames with one request per batch (one filename per line), instead of one request per file
+  # @return A dict of {filename: translated filename}
+  translatedFilenames = {}
+  filenamesToTranslate = []
+  for filename in filenames:
+    if filename in translatedFilenameCache:  # still in the inputDir from the last scan (e.g., the DeepL translation failed), no need to ask the web page again
+      translatedFilenames[filename] = translatedFilenameCache[filename]
+    elif not any(c.isalpha() for c in os.path.splitext(filename)[0]):  # nothing to translate (e.g., "2024-01-31_0001.pdf")
+      translatedFilenames[filename] = filename
+    else:
+      filenamesToTranslate.append(filename)
+
+  batches = []
+  batch = []
+  batchLen = 0
+  for filename in filenamesToTranslate:
+    if batch and (len(batch) >= maxFilenamesPerBatch or batchLen + len(filename) + 1 > maxCharsPerBatch):
+      batches.append(batch)
+      batch = []
+      batchLen = 0
+    batch.append(filename)
+    batchLen = batchLen + len(filename) + 1
+  if batch:
+    batches.append(batch)
+
+  for batch in batches:
+    if len(batch) == 1:  # nothing to batch up
+      translatedFilenames[batch[0]] = getTranslatedFilename(batch[0])
+      continue
+    logger.info(f"Translating {len(batch)} input filenames to target language.")
+    try:
+      transTexts = translateText("\n".join(filename.replace("_", " ") for filename in batch)).split("\n")
+    except Exception as error:
+      logger.error("\tUnknown error occurred during the filename translator.")
+      logger.error(f"\t{error}")
+      transTexts = []
+    if len(transTexts) != len(batch):  # the translator merged or split some lines, so fall back to one at a time
+      logger.warning("\tUnable to translate the filenames as a batch.  Translating them one at a time.")
+      for filename in batch:
+        translatedFilenames[filename] = getTranslatedFilename(filename)
+      continue
+    for filename, transText in zip(batch, transTexts):
+      transText = transText.strip()
+      if "_" in filename: # undo the replacement of underscores/spaces
+        transText = transText.replace(" ", "_")
+      origLang = detectLanguage(filename.replace("_", " "))
+      logger.info(f"\t{origLang.upper()} -> {filename}")
+      logger.info(f"\t{targetLangShort.upper()} -> {transText}")
+      translatedFilenames[filename] = transText
+
+  # remember the translations for the next scan, only for files still in the inputDir (so it can't grow) and not the failures (returned untranslated, so they are retried)
+  translatedFilenameCache.clear()
+  translatedFilenameCache.update((filename, transText) for filename, transText in translatedFilenames.items() if transText != filename)
+  return translatedFilenames
+
 def getUsage():  # not used anymore
   # @return The number of characters left in your usage allowance.
   # originally copied from https://github.com/DeepLcom/deepl-python#translating-documents
@@ -166,55 +330,51 @@ def getUsage():  # not used anymore
     logger.warning(f"\t{error}")
   return charsLeft # can still translate
 
-def removeBlankPDFPages(filenamePDF):
-  # identify and remove blank pages from a PDF
+def getNonBlankPageNumbers(reader):
+  # identify the blank pages of a PDF (e.g., the translation of a page that was only a picture)
+  # @return The (0-based) numbers of the pages that aren't blank.  All the pages if every one is blank, as an empty PDF can't be appended
   logger.info('Attempting to remove any blank pages form the translated document.')
-  reader = PdfReader(filenamePDF)
-  writer = PdfWriter()
-  
-  try:
-    numPages = len(reader.pages)
-    for page_number in range(numPages):
-      page = reader.pages[page_number]
-      # Once you have your Page object, call its extractText() method to return a string of the page’s text ❸. The text extraction isn’t perfect. 
-      page_contents = page.get_contents()
-      if not (page_contents is None):
-        writer.add_page(page)
-        true_page_number = page_number+1
-        logger.info(f"\tPage {true_page_number} of {numPages} is not blank.")
-      else:
-        logger.info(f"\tPage {true_page_number} of {numPages} is blank.")
-    writer.write(filenamePDF)
-    logger.info('\tPDF cleaned successful.')
-    writer.close()
-    return True
-  except Exception as error:
-    writer.close()
-    logger.error("Unknown error occurred during the PDF blank page removal process.")
-    logger.error(f"{error}")
-    return False
+  numPages = len(reader.pages)
+  pageNumbers = []
+  for page_number, page in enumerate(reader.pages):
+    if not (page.get_contents() is None):
+      pageNumbers.append(page_number)
+      logger.debug("\tPage %s of %s is not blank.", page_number+1, numPages)
+    else:
+      logger.info(f"\tPage {page_number+1} of {numPages} is blank.")
+  if len(pageNumbers) == 0:
+    logger.info('\tEvery page is blank, keeping them all.')
+    return list(range(numPages))
+  return pageNumbers
 
 def appendPDFs(origPDF, translatedPDF, outputPDF):
-  # combine PDFs into a single PDF
-  removeBlankPDFPages(translatedPDF)
+  # combine PDFs into a single PDF, leaving out the blank pages of the translation
   writer = PdfWriter()
   
-  logger.info('Appending the translated PDF to the end of the original PDF.')
   try:
+    # parse both PDFs before appending anything, so an unreadable file fails the merge before any pages are copied
+    translatedReader = PdfReader(translatedPDF)
+    origReader = PdfReader(origPDF)
+    # the blank pages are skipped while merging, rather than writing out a cleaned copy of the translation first and parsing it all over again
+    translatedPages = getNonBlankPageNumbers(translatedReader)
+    logger.info('Appending the translated PDF to the end of the original PDF.')
     if isPutOrigFirst:
-      writer.append(origPDF, "Original", None, True)
-      writer.append(translatedPDF, "Translation", None, True)
+      writer.append(origReader, "Original", None, True)
+      writer.append(translatedReader, "Translation", translatedPages, True)
     else:
-      writer.append(translatedPDF, "Translation", None, True)
-      writer.append(origPDF, "Original", None, True)
+      writer.append(translatedReader, "Translation", translatedPages, True)
+      writer.append(origReader, "Original", None, True)
     writer.write(outputPDF)
     writer.close()
     logger.info('\tPDF merger successful.')
     return True
   except Exception as error:
     writer.close()
-    logger.error("Unknown error occurred during the PDF merging process.")
-    logger.error(f"{error}")
+    if isinstance(error, FileNotFoundError) and error.filename == translatedPDF:
+      logger.warning(f"Temporary file does not exist: {translatedPDF}")
+    else:
+      logger.error("Unknown error occurred during the PDF merging process.")
+      logger.error(f"{error}")
     return False
 
 def getSafeFilename(inputFilename):
@@ -222,32 +382,26 @@ def getSafeFilename(inputFilename):
   # @param inputFilename A filename containing illegal characters  
   # @return A filename containing only safe characters  
   
-  # Set here the valid chars (note the lack of <space> as a valid char)
-  safechars = string.ascii_letters + string.digits + "-_."
+  # most filenames are already safe (e.g., scanner output like "scan_0001.pdf"), nothing to clean then
+  if safeChars.issuperset(inputFilename):
+    return inputFilename
   try:
       # trim whitespace off the edges of the filename
-      fileRoot = os.path.splitext(inputFilename)[0].strip()
-      fileExten = os.path.splitext(inputFilename)[1]
-      inputFilename = fileRoot  + fileExten
-      
-      # remove excessive spaces & convert whitespace to a single proper space
-      inputFilename = re.sub(r"\s+", " ", inputFilename)
+      (fileRoot, fileExten) = os.path.splitext(inputFilename)
+      inputFilename = fileRoot.strip() + fileExten
       
-      # convert spaces to underscores
-      inputFilename = inputFilename.replace(" ", "_")
+      # remove excessive spaces & convert each run of whitespace to a single underscore
+      inputFilename = whitespaceRegEx.sub("_", inputFilename)
       
       # replace non-ASCII chars with ASCII ones (e.g., ø to o, æ to ae)
       # carve out special characters that I don't think unidecode() does well
-      inputFilename = inputFilename.replace("Å", "Aa")
-      inputFilename = inputFilename.replace("å", "aa")
-      inputFilename = inputFilename.replace("¢", "ø")
+      inputFilename = inputFilename.translate(specialCharTable)
       inputFilename = unidecode(inputFilename)
       
       # now brutally remove any non-ASCII, un-allowed characters
-      filteredList = list(filter(lambda c: c in safechars, inputFilename))
-      filterStr = ''.join(filteredList)
+      filterStr = inputFilename.translate(unsafeCharTable)
       return filterStr
-  except:
+  except Exception: # not a bare except, that would also swallow the SystemExit from handleSignal()
       return ""
   pass 
     
@@ -265,147 +419,143 @@ def renameToSafeFilename(directory, oldFilename, newFilename):
   logger.info(f"\told: {oldFilename}")
   logger.info(f"\tnew: {newFilename}")
 
-  if os.path.isfile(newFullname):
-    logger.error(f"New filename already exists.")
-    return "" # blank return value indicates an error occurred
-  else:
+  if directoryObserver is not None: # only an observer sees the new name appear (& waitForNewFiles() empties the set), so only remember it then
+    renamedInputFiles.add(os.path.normpath(newFullname)) # it isn't a new file
+  try:
+    # link() fails if newFilename already exists, so the check and the rename are one step (rename()/replace() would silently overwrite it)
+    # both names are in the same directory, so the rename never crosses filesystems
     try:
+      os.link(oldFullname, newFullname)
+    except (FileExistsError, FileNotFoundError):
+      raise
+    except OSError: # the filesystem doesn't do hard links (e.g., some network shares), fall back to check & rename
+      if os.path.isfile(newFullname):
+        raise FileExistsError(newFullname)
       os.rename(oldFullname, newFullname)
-      logger.info(f'Renaming successful.')
-      return newFilename
-    except OSError as error:
-      logger.error(f"Unknown error when renaming the file.")
-      logger.error(f"{error}")
-      return "" # blank return value indicates an error occurred
+    else:
+      try:
+        os.unlink(oldFullname)
+      except OSError:
+        try:
+          os.remove(newFullname) # undo the link, otherwise the file is left under both names and gets processed twice
+        except OSError:
+          pass
+        raise # report why the old name couldn't be removed
+    logger.info(f'Renaming successful.')
+    return newFilename
+  except FileExistsError:
+    renamedInputFiles.discard(os.path.normpath(newFullname))
+    logger.error(f"New filename already exists.")
+    return "" # blank return value indicates an error occurred
+  except OSError as error:
+    renamedInputFiles.discard(os.path.normpath(newFullname))
+    logger.error(f"Unknown error when renaming the file.")
+    logger.error(f"{error}")
+    return "" # blank return value indicates an error occurred
       
 def deleteFile(filename):
   # deletes a file, with some error checking 
   logger.info(f"Attempting to delete file:")
   logger.info(f"\t{filename}")
-  if os.path.exists(filename):
-    try:
-      os.remove(filename)
-      logger.info(f"\tFile successfully deleted.")
-      return True
-    except:
-      logger.warning(f"\tError while trying to delete file: {filename}")
-      return False
-  else:
+  try:
+    os.remove(filename) # just try it, remove() tells us if the file wasn't there (no separate exists() check for it to race with)
+    logger.info(f"\tFile successfully deleted.")
+    return True
+  except FileNotFoundError:
     logger.warning(f"\tFile did not exist in the first place. Nothing to do.")
     return True
+  except OSError as error:
+    logger.warning(f"\tError while trying to delete file: {filename}")
+    logger.warning(f"\t{error}")
+    return False
   
 def getCharCountOfPDF(filename): # not used anymore
   # attempts to estimate how many characters are in a PDF
   # does not work unless the PDF has been OCRed or otherwise includes text (e.g., printed from a Word document)
-  saved_text = ""
   reader = PdfReader(filename)
   numPages = len(reader.pages)
-  for page_number in range(numPages):
+  # text extraction is the slow part, so for a big PDF only the first few pages are read and the rest is extrapolated
+  numPagesToRead = numPages if numPages <= 20 else 5
+  charCount = 0
+  for page_number in range(numPagesToRead):
     page = reader.pages[page_number]
     # Once you have your Page object, call its extractText() method to return a string of the page’s text ❸. The text extraction isn’t perfect. 
-    page_content = page.extract_text()
-    saved_text = saved_text + page_content
-  # print(saved_text)
-  # print("-----------------------------")
-  charCount = len(saved_text)
-  logger.debug(f'Estimated number of characters in the file: {charCount:,}')
+    charCount = charCount + len(page.extract_text() or "") # just count, rather than gluing all the text together
+  if numPagesToRead < numPages:
+    charCount = charCount * numPages // numPagesToRead
+  logger.debug('Estimated number of characters in the file: %s', format(charCount, ","))
   return charCount
   
+def handleSignal(signum, frame):
+  # SIGTERM (e.g., `docker stop`) handler.  Does as little as possible, no logging (we could be in the middle of writing a log record),
+  # it just unwinds the main loop so the atexit hooks can write out the queued log records on the normal execution path
+  raise SystemExit(128 + signum)
+
 def exitProgram(msg=""):
   # exits the program, was going to do more but changed my mind
   sys.exit(msg)   # exit the program
   return
   
-def sleepWithACountdown(secs, isTop=True):
+def sleepWithACountdown(secs):
   # a rather involved subroutine to put the program to sleep and nicely output a countdown to the log.
 
-  # set some constants
-  days_inSecs    = 1 * 24 * 60 * 60
-  hours_inSecs   = 1      * 60 * 60
-  minutes_inSecs = 1           * 60
+  # create a output message
+  delayStr = []
+  totalSleepTime = secs
+  if totalSleepTime > days_inSecs:
+    (tmpVal, totalSleepTime) = divmod(totalSleepTime, days_inSecs)
+    delayStr.append(f"{tmpVal} day(s)")
+  if totalSleepTime > hours_inSecs:
+    (tmpVal, totalSleepTime) = divmod(totalSleepTime, hours_inSecs)
+    delayStr.append(f"{tmpVal} hour(s)")
+  if totalSleepTime > minutes_inSecs:
+    (tmpVal, totalSleepTime) = divmod(totalSleepTime, minutes_inSecs)
+    delayStr.append(f"{tmpVal} minute(s)")
+  if totalSleepTime > 0:
+    delayStr.append(f"{totalSleepTime} second(s)")
+  tmpStr = ", ".join(delayStr)
+  wakeTime = datetime.now() + timedelta(seconds=secs)
+  logger.info(f"Putting the program to sleep for {tmpStr} (until {wakeTime:%Y-%m-%d %H:%M}).")
+  # logger.info(f"Counting down the sleep period ...")
   
-  if isTop: # isTop is there to handle recursive function issues
-    # create a output message
-    delayStr = []
-    totalSleepTime = secs
-    if totalSleepTime > days_inSecs:
-      (tmpVal, totalSleepTime) = divmod(totalSleepTime, days_inSecs)
-      delayStr.append(f"{tmpVal} day(s)")
-    if totalSleepTime > hours_inSecs:
-      (tmpVal, totalSleepTime) = divmod(totalSleepTime, hours_inSecs)
-      delayStr.append(f"{tmpVal} hour(s)")
-    if totalSleepTime > minutes_inSecs:
-      (tmpVal, totalSleepTime) = divmod(totalSleepTime, minutes_inSecs)
-      delayStr.append(f"{tmpVal} minute(s)")
-    if totalSleepTime > 0:
-      delayStr.append(f"{totalSleepTime} second(s)")
-    tmpStr = ", ".join(delayStr)
-    logger.info(f"Putting the program to sleep for {tmpStr}.")
-    # logger.info(f"Counting down the sleep period ...")
-    
 
-    # turn off the logger's automatic NewLine for this subroutine
-    origTerminator_CH = consoleHandler.terminator
-    consoleHandler.terminator = ""
-    if not (globalFileHandler is None): # note the creation of the GFL may have failed
-      origTerminator_GFL = globalFileHandler.terminator
-      globalFileHandler.terminator = ""
-      globalFileHandler.setFormatter(logging.Formatter('%(message)s')) # turn off the custom formatting too
+  # turn off the logger's automatic NewLine for this subroutine
+  # the countdown (isCountdownTick) only goes to the console, the global log file filters it out, so its NewLine & formatting can be left alone
+  origTerminator_CH = consoleHandler.terminator
+  consoleHandler.terminator = ""
 
   
-  # an array of granularity levels
-  # period_letter, period_delay, period_minimum, secs_in_the_letter
-  periods = [
-    ('d',        days_inSecs,   2.1 * days_inSecs,      days_inSecs),
-    ('h',   5 * hours_inSecs,   9.9 * hours_inSecs,     hours_inSecs),
-    ('h',       hours_inSecs,         hours_inSecs,     hours_inSecs),
-    ('m', 5 * minutes_inSecs,   9.9 * minutes_inSecs,   minutes_inSecs),
-    ('m',     minutes_inSecs,         minutes_inSecs,   minutes_inSecs),
-    ('s',                  5,    9,                    1),
-    ('s',                  1,    -1,                    1)
-  ]
-  
-  # select which granularity we are at
-  for period_letter, period_delay, period_minimum, secs_in_the_letter in periods:
-    if secs > period_minimum:
-      delayPeriod = period_delay
-      delayLetter = period_letter
-      granularityThreshold = period_minimum
-      amountOfSecs = secs_in_the_letter
-      break
-      
   # conduct the countdown
+  deadline = time.monotonic() + secs # each tick sleeps until its own point before the deadline, so the time spent logging doesn't add up over a multi-day sleep
   remaingSecs = secs
+  granularityThreshold = None
   while remaingSecs > 0:
-    if remaingSecs < granularityThreshold:
-      sleepWithACountdown(remaingSecs, False) # the easiest way to change the delayLetter to the next level of granularity is to just recursively call the function
-      remaingSecs = 0
+    if granularityThreshold is None or remaingSecs < granularityThreshold:
+      # select which granularity we are at (the last period whose minimum is below remaingSecs), stepping down to finer granularity as the countdown goes on
+      (delayLetter, delayPeriod, granularityThreshold, amountOfSecs) = countdownPeriods[max(0, bisect.bisect_left(countdownPeriodMinimums, remaingSecs) - 1)]
     elif remaingSecs >= delayPeriod:
       (i, remainder) = divmod(remaingSecs, amountOfSecs)
-      logger.info(f"{i}{delayLetter} ... ")
+      logger.info(f"{i}{delayLetter} ... ", extra={"isCountdownTick": True})
       remaingSecs = remaingSecs - delayPeriod
-      time.sleep(delayPeriod)
-    elif remaingSecs < delayPeriod and remaingSecs > 0:
-      logger.info(f"{remaingSecs}{delayLetter} ... ")
-      time.sleep(remaingSecs)
-      remaingSecs = 0
+      time.sleep(max(0, deadline - remaingSecs - time.monotonic())) # sleep until remaingSecs before the deadline
     else:
+      logger.info(f"{remaingSecs}{delayLetter} ... ", extra={"isCountdownTick": True})
+      time.sleep(max(0, deadline - time.monotonic()))
       remaingSecs = 0
 
 
-  if isTop:
-    # turn on the logger's automatic NewLine
-    consoleHandler.terminator = origTerminator_CH
-    if not (globalFileHandler is None):
-      globalFileHandler.terminator = origTerminator_GFL
+  # turn on the logger's automatic NewLine
+  consoleHandler.terminator = origTerminator_CH
 
-  
-    # write final line (with restored NewLine)
-    logger.info(f"0s")
+  # write final line (with restored NewLine)
+  logger.info(f"0s", extra={"isCountdownTick": True})
+  return
 
-    # turn on the logger's formatting
-    if not (globalFileHandler is None):
-      globalFileHandler.setFormatter(globalFileFormatter)
+def flushGlobalLogQueue():
+  # waits for the background thread to write out everything queued for the global log file.  Needed before changing the globalFileHandler's formatter.
+  if not (globalLogListener is None):
+    globalLogListener.stop() # stop() finishes writing the queue before it returns
+    globalLogListener.start()
   return
 
 def numbOfSecsTillRenewal(defaultPeriodToWait_Days=7):
@@ -416,24 +566,25 @@ def numbOfSecsTillRenewal(defaultPeriodToWait_Days=7):
   waitUntilNewUsage_Sec = defaultPeriodToWait_Days * 24 * 60 * 60
 
   # calculate the time to wait, if the usageRenewalDay value is set (default value is 0, which fails the if statement)
-  logger.debug(f"\tnumbOfSecsTillRenewal() debug output ...")
-  logger.debug(f"\tusageRenewalDay:         {usageRenewalDay}")
+  logger.debug("\tnumbOfSecsTillRenewal() debug output ...")
+  logger.debug("\tusageRenewalDay:         %s", usageRenewalDay)
   if usageRenewalDay >= 1 and usageRenewalDay <= 31 : # use a more accurate day for the sleep time
     now_dateTime  = datetime.now()
-    if usageRenewalDay > now_dateTime.day:
-      lastRenewal_dateTime = datetime(now_dateTime.year, now_dateTime.month, usageRenewalDay) + relativedelta(months=-1)
-    else:
-      lastRenewal_dateTime = datetime(now_dateTime.year, now_dateTime.month, usageRenewalDay)
-    nextRenewal_dateTime = lastRenewal_dateTime + relativedelta(days=1, months=1) # add 1 day to the renewal date to avoid any corner case issues (time zone mismatch [local vs API servers] is really my concern)
+    (year, month) = (now_dateTime.year, now_dateTime.month)
+    if usageRenewalDay > now_dateTime.day: # not renewed yet this month, so the last renewal was last month
+      (year, month) = (year, month - 1) if month > 1 else (year - 1, 12)
+    lastRenewal_dateTime = datetime(year, month, min(usageRenewalDay, calendar.monthrange(year, month)[1])) # min() because not every month has a 31st
+    (year, month) = (year, month + 1) if month < 12 else (year + 1, 1)
+    nextRenewal_dateTime = datetime(year, month, min(usageRenewalDay, calendar.monthrange(year, month)[1])) + timedelta(days=1) # add 1 day to the renewal date to avoid any corner case issues (time zone mismatch [local vs API servers] is really my concern)
     duration_dateTime = nextRenewal_dateTime - now_dateTime
     waitUntilNewUsage_Sec = duration_dateTime.total_seconds()
 
-    logger.debug(f"\tlastRenewal_dateTime = {lastRenewal_dateTime}")
-    logger.debug(f"\tnow_dateTime = {now_dateTime}")
-    logger.debug(f"\tnow_dateTime (parts) = {now_dateTime.year} -- {now_dateTime.month} -- {now_dateTime.day}")
-    logger.debug(f"\tnextRenewal_dateTime = {nextRenewal_dateTime}")
-    logger.debug(f"\tduration_dateTime = {duration_dateTime}")
-    logger.debug(f"\twaitUntilNewUsage_Sec = {waitUntilNewUsage_Sec}")
+    logger.debug("\tlastRenewal_dateTime = %s", lastRenewal_dateTime)
+    logger.debug("\tnow_dateTime = %s", now_dateTime)
+    logger.debug("\tnow_dateTime (parts) = %s -- %s -- %s", now_dateTime.year, now_dateTime.month, now_dateTime.day)
+    logger.debug("\tnextRenewal_dateTime = %s", nextRenewal_dateTime)
+    logger.debug("\tduration_dateTime = %s", duration_dateTime)
+    logger.debug("\twaitUntilNewUsage_Sec = %s", waitUntilNewUsage_Sec)
   return waitUntilNewUsage_Sec
 
 def to_bool(value, defaultVal):
@@ -446,15 +597,222 @@ def to_bool(value, defaultVal):
     else:
       return False
   elif (type(value) is str):
-    if value.lower() in ("yes", "y", "true",  "t", "1", "1.0"): 
+    value = value.lower()
+    # set literals after `in` are compiled into frozenset constants, so these are hash lookups with nothing built per call
+    if value in {"yes", "y", "true",  "t", "1", "1.0"}: 
       return True
-    elif value.lower() in ("no",  "n", "false", "f", "0", "0.0", "", "none", "[]", "{}"): 
+    elif value in {"no",  "n", "false", "f", "0", "0.0", "", "none", "[]", "{}"}: 
       return False
     else:
       return defaultVal
   else:
     return defaultVal
 
+class NewPDFEventHandler(FileSystemEventHandler):
+  # watchdog callback, queues up any PDF that is created in (or moved into) the inputDir
+  def __init__(self, eventQueue):
+    super().__init__()
+    self.eventQueue = eventQueue
+
+  def on_created(self, event):
+    if not event.is_directory and isWantedPDF(os.path.basename(event.src_path)):
+      self.eventQueue.put(event.src_path)
+
+  def on_moved(self, event):
+    if not event.is_directory and isWantedPDF(os.path.basename(event.dest_path)):
+      self.eventQueue.put(event.dest_path)
+
+def isWantedPDF(filename):
+  # only name checks (no stat() calls), skips hidden files like the macOS "._name.pdf" AppleDouble files that show up on network shares
+  return filename.lower().endswith(".pdf") and not filename.startswith(".")
+
+def isNetworkFilesystem(directory):
+  # inotify events don't propagate over network shares, so find the filesystem type of the directory via /proc/mounts
+  fsType = ""
+  bestMountPoint = ""
+  realDirectory = os.path.realpath(directory)
+  try:
+    with open("/proc/mounts") as mounts:
+      for line in mounts:
+        fields = line.split()
+        if len(fields) < 3:
+          continue
+        mountPoint = fields[1].replace("\\040", " ") # /proc/mounts escapes spaces
+        if (realDirectory == mountPoint or realDirectory.startswith(mountPoint.rstrip("/") + "/")) and len(mountPoint) > len(bestMountPoint):
+          bestMountPoint = mountPoint
+          fsType = fields[2]
+  except OSError:
+    return False # no /proc/mounts (e.g., not Linux), assume a local filesystem
+  return fsType.startswith(("nfs", "cifs", "smb"))
+
+def startDirectoryObserver(directory, eventQueue):
+  # start watching the directory for new files, falls back to polling for network shares
+  if isNetworkFilesystem(directory):
+    logger.info(f"Input directory is on a network share, polling it for new files.")
+    observer = PollingObserver(timeout=max(30, checkPeriodSec))
+  else:
+    logger.debug("\tWatching the input directory for new files.")
+    observer = Observer()
+  observer.schedule(NewPDFEventHandler(eventQueue), directory, recursive=False)
+  observer.start()
+  return observer
+
+def waitForFileToSettle(filename, settleSecs=1, maxTries=300):
+  # waits until the file size stops changing, so we don't upload a half-copied file
+  try:
+    oldSize = os.path.getsize(filename)
+    for i in range(maxTries):
+      time.sleep(settleSecs)
+      newSize = os.path.getsize(filename)
+      if newSize == oldSize:
+        return True
+      oldSize = newSize
+  except OSError:
+    pass # file vanished, the directory scan will sort it out
+  return False
+
+def waitForNewFiles(timeoutSecs):
+  # blocks until the observer reports a new PDF or the timeout expires (the timeout is a safety net re-scan of inputDir)
+  logger.info(f"Waiting for new files (re-scanning the input directory in {checkPeriodMin} minute(s) regardless).")
+  deadline = time.monotonic() + timeoutSecs
+  while True:
+    try:
+      newFile = newFileQueue.get(timeout=max(0, deadline - time.monotonic()))
+    except queue.Empty:
+      renamedInputFiles.clear() # the events of this pass's renames are all in, don't carry the names over to the next pass
+      return
+    if isNewInputFile(newFile):
+      break
+  logger.info(f"New file detected: {newFile}")
+  waitForFileToSettle(newFile)
+  # drain any other events, the directory scan will pick those files up too
+  while True:
+    try:
+      newFile = newFileQueue.get_nowait()
+    except queue.Empty:
+      break
+    if isNewInputFile(newFile):
+      waitForFileToSettle(newFile)
+  renamedInputFiles.clear() # the events of this pass's renames are all in, don't carry the names over to the next pass
+  return
+
+def isNewInputFile(filename):
+  # weeds out the observer events caused by the program itself (the safe filename renames) and files that are already gone (e.g., processed & deleted)
+  normFilename = os.path.normpath(filename)
+  if normFilename in renamedInputFiles:
+    renamedInputFiles.discard(normFilename)
+    return False
+  return os.path.exists(filename)
+
+class IndividualLogHandler(logging.Handler):
+  # one handler that stays on the logger for good and passes each record on to the individual log file of the thread that logged it
+  # (the worker threads never add/remove handlers on the shared logger, which can make another thread's record skip a handler)
+  def __init__(self):
+    super().__init__(logging.DEBUG)
+    self.threadHandlers = {} # {thread ident: handler of the file that thread is processing}
+
+  def setThreadHandler(self, handler):
+    # @param handler The handler for the calling thread's records, None to stop passing them on
+    if handler is None:
+      self.threadHandlers.pop(threading.get_ident(), None)
+    else:
+      self.threadHandlers[threading.get_ident()] = handler
+
+  def handle(self, record):
+    handler = self.threadHandlers.get(record.thread)
+    if handler is not None:
+      handler.handle(record)
+
+def processFile(filename):
+  # clean, translate, merge & clean up a single PDF from the inputDir.  Called from a pool of threads, so several files are being translated at once.
+  # @param filename The (un-cleaned) name of the file in the inputDir
+  # @return True if the file was processed, False if it was skipped
+  if wasQuotaExceeded or wasRateLimited or shutdownEvent.is_set():  # immediate exit out if the quota is exceeded, DeepL asked us to slow down or the program is exiting
+    return False
+
+  filename_orig = filename
+
+  # clean the filename to avoid any un-safe chars that would prevent us from uploading the file to the web API
+  filename = getSafeFilename(filename)
+  if filename == "":  # a blank filename is the result a failed cleaning
+    # report the error and skip
+    logger.info(f'Processing file: {os.path.join(inputDir, filename_orig)}') # note the usage on the un-cleaned file name for this log entry
+    logger.error(f'Unable to properly clean the filename to allow uploading to the Web API.')
+    logger.error(f'Skipping file.')
+  else:
+    # create variables for all the files
+    inputFile  = os.path.join(inputDir, filename)
+    outputFile = os.path.join(outputDir, filename)
+    tmpFile    = os.path.join(tmpDir, filename)
+    logFile    = os.path.join(logDir,os.path.splitext(filename)[0] + '.log')
+    if isTransFilename:  # rename if we are using the translated filename instead of the safe one
+      outputFile = os.path.join(outputDir, translatedFilenames[filename_orig])
+    
+
+    # setup the individual (non-global) log file
+    try:
+      fileTarget = logging.FileHandler(logFile)
+      fileTarget.setLevel(logging.DEBUG)
+      fileTarget.setFormatter(logging.Formatter('%(asctime)s - %(levelname)7s - %(message)s'))
+      # buffer the records in memory and write them out in bulk (right away for errors, so they aren't lost if we crash)
+      fileHandler = logging.handlers.MemoryHandler(1024, flushLevel=logging.ERROR, target=fileTarget, flushOnClose=True)
+      fileHandler.setLevel(logging.DEBUG)
+      individualLogHandler.setThreadHandler(fileHandler) # other files are processed at the same time (in other threads), only this thread's records go to this file
+    except Exception as error:
+      fileHandler = None # assign the None value if fileHandler failed
+      logger.warning(f"Unable to write to individual log file!")
+      logger.warning(f"\tIndividual Log file: {logFile}")
+      logger.warning(f"\t{error}")
+
+    # report start of processing
+    logger.info(f'Processing file: {os.path.join(inputDir, filename_orig)}') # note the usage on the un-cleaned file name for this log entry
+
+    # rename if we need the filename to be made safe/clean (if same name, exits the subroutine early)
+    renameToSafeFilename(inputDir, filename_orig, filename)
+
+    if shutdownEvent.is_set(): # the program is exiting, don't start an upload it won't wait for (the file stays in the inputDir for the next run)
+      logger.warning(f'Program is exiting, skipping the file.')
+      wasMerged = False
+    else:
+      # translate the document (a missing inputFile is reported by translateDocument(), no need to stat() it first)
+      cachedFile = None
+      wasCached = False     # the translation came out of the cache
+      wasTranslated = False # the translation came from DeepL
+      if allowFileTranslation:
+        cachedFile = getCachedTranslationName(inputFile, targetLang) # None if there is no cache
+        wasCached = getCachedTranslation(cachedFile, tmpFile)
+        if not wasCached:
+          wasTranslated = translateDocument(inputFile, tmpFile, targetLang)
+      
+      # append the translated PDF to the original PDF and put in outputDir (a missing tmpFile is reported by appendPDFs())
+      wasMerged = appendPDFs(inputFile, tmpFile, outputFile)
+
+      # only keep translations that are known to merge, otherwise a broken one would be re-used on every pass instead of being translated again
+      if wasMerged and wasTranslated:
+        cacheTranslation(tmpFile, cachedFile)
+      elif wasCached and not wasMerged:
+        removeCachedTranslation(cachedFile)
+
+    # clean up the old files, make sure that inputFiles aren't re-translated at another date
+    if (wasMerged and allowFileDeletion): # if we successfully created the outputFile
+      deleteFile(tmpFile)
+      deleteFile(inputFile)
+
+    logger.info(f'Finished processing file.')
+    # getUsage() # annoyingly DeepL doesn't update their usage quickly.  So, this line got  removed as worthless.
+    try:
+      if not (fileHandler is None):
+        individualLogHandler.setThreadHandler(None) # close the log before moving on to the next file
+        fileHandler.close() # writes out whatever is still buffered
+        fileTarget.close()  # MemoryHandler.close() doesn't close its target
+    except Exception as error:
+      logger.debug("Unable to close individual log file.  (Probably never opened in the 1st place.)")
+      logger.debug("\tIndividual Log file: %s", logFile)
+      logger.debug("\t%s", error)
+
+  logger.info(logSeparator) # added separator line to global log
+  return (filename != "") # False if the file was skipped
+
 def reportResults():
   logger.info(f"Final output report")
   logger.info(f"\tFinal output report")
@@ -508,9 +866,39 @@ else:
   allowFileDeletion = False
   allowToExitWithoutLoop = True
   # variables shown to outside world
-scriptVersion = "2.2.0"
+scriptVersion = "2.3.0"
   # internal variables
+filenameTranslators = ('google', 'bing', 'deepl') # Google is better but I don't trust them to not screw with their webpage and break the translators API; Bing is the translators API default tool; DeepL (non-API) tends to error on a captcha
+maxFilenamesPerBatch = 50  # filenames translated per request to the translators web page API
+maxCharsPerBatch = 1000    # the smallest query length any of the filenameTranslators will accept (Bing)
+translatedFilenameCache = {} # {filename: translated filename} from the last scan of the inputDir
+whitespaceRegEx = re.compile(r"\s+")  # getSafeFilename() runs on every PDF of every scan, so compile once
+safeChars = frozenset(string.ascii_letters + string.digits + "-_.") # the valid filename chars (note the lack of <space> as a valid char), a set so getSafeFilename() does a hash lookup per char
+unsafeCharTable = dict.fromkeys(c for c in range(256) if chr(c) not in safeChars) # deletes every un-allowed char in a single translate(), unidecode() only leaves ASCII so 256 chars covers it
+specialCharTable = str.maketrans({"Å": "Aa", "å": "aa", "¢": "ø"}) # special characters that I don't think unidecode() does well
+maxCachedTranslations = 20 # translated documents kept in the cache (tmpDir/cache), oldest are deleted first
+days_inSecs    = 1 * 24 * 60 * 60
+hours_inSecs   = 1      * 60 * 60
+minutes_inSecs = 1           * 60
+# the countdown granularity levels for sleepWithACountdown(), sorted by period_minimum so it can bisect() them
+# period_letter, period_delay, period_minimum, secs_in_the_letter
+countdownPeriods = (
+  ('s',                  1,    -1,                    1),
+  ('s',                  5,    9,                     1),
+  ('m',     minutes_inSecs,         minutes_inSecs,   minutes_inSecs),
+  ('m', 5 * minutes_inSecs,   9.9 * minutes_inSecs,   minutes_inSecs),
+  ('h',       hours_inSecs,         hours_inSecs,     hours_inSecs),
+  ('h',   5 * hours_inSecs,   9.9 * hours_inSecs,     hours_inSecs),
+  ('d',        days_inSecs,   2.1 * days_inSecs,      days_inSecs)
+)
+countdownPeriodMinimums = [period[2] for period in countdownPeriods]  # bisect needs the keys on their own
+maxConcurrentFiles = 4     # files translated at the same time (DeepL is fine with a handful of parallel document requests)
+logSeparator = '-' * 40  # separator line for the global log, built once instead of an f-string per file
 wasQuotaExceeded = False
+renamedInputFiles = set() # paths renameToSafeFilename() created in the inputDir, so waitForNewFiles() doesn't take them for new files (emptied after each wait)
+shutdownEvent = threading.Event() # set when the program is exiting (e.g., SIGTERM), the worker threads stop starting new translations
+wasRateLimited = False     # set when DeepL answers "too many requests" (HTTP 429), the remaining files wait for the next scan
+rateLimitedSec = 5 * minutes_inSecs # how long to back off after DeepL says it is overloaded, before the next scan
 checkPeriodSec = checkPeriodMin * 60 # note my inconsistency between "_Sec" and "Sec" (no underscore) when naming variables.  I know I should be better.
 
 
@@ -521,25 +909,38 @@ try:
   globalFileHandler.setLevel(logging.INFO)
   globalFileFormatter = logging.Formatter('%(asctime)s - %(levelname)7s - %(message)s')
   globalFileHandler.setFormatter(globalFileFormatter)
-  logger.addHandler(globalFileHandler)
+  # the file is written by a background thread, so the main loop only ever puts records on a queue and never waits on the disk
+  globalLogQueue = queue.Queue(-1)
+  globalQueueHandler = logging.handlers.QueueHandler(globalLogQueue)
+  globalQueueHandler.setLevel(logging.INFO) # don't bother queueing records the file will throw away
+  globalQueueHandler.addFilter(lambda record: not getattr(record, "isCountdownTick", False)) # the sleep countdown is for the console, the file just gets the "Putting the program to sleep" line
+  globalLogListener = logging.handlers.QueueListener(globalLogQueue, globalFileHandler, respect_handler_level=True)
+  globalLogListener.start()
+  atexit.register(globalLogListener.stop) # write out anything still queued when the program exits
+  logger.addHandler(globalQueueHandler)
   globalFileHandler.setFormatter(logging.Formatter('%(message)s')) # turn off the custom formatting too
   logger.info(f"") # start on a fresh line (in-case the server crashed mid-line the previous run)
+  flushGlobalLogQueue()
   globalFileHandler.setFormatter(globalFileFormatter) # turn the formatting back on
   logger.info(f"Creating global log file!")
   logger.info(f"\tGlobal Log file: {globalLogFile}")
 except Exception as error:
   globalFileHandler = None # assign the None value if fileHandler failed
+  globalLogListener = None
   logger.info(f"") # start on a fresh line (in-case the server crashed mid-line the previous run)
   logger.warning(f"Unable to write to global log file!")
   logger.warning(f"\tGlobal Log file: {globalLogFile}")
   logger.warning(f"\t{error}")
-logger.info(f'----------------------------------------') # added separator line to global log
+individualLogHandler = IndividualLogHandler() # the individual (per file) log files, see processFile()
+logger.addHandler(individualLogHandler)
+logger.info(logSeparator) # added separator line to global log
 logger.info(f'--- Starting new execution of script ---') 
-logger.info(f'----------------------------------------') # added separator line to global log
+logger.info(logSeparator) # added separator line to global log
+signal.signal(signal.SIGTERM, handleSignal)
 
 # spit out some debug info
+targetLangShort = targetLang[0:2].lower()
 if True:  # really just here for indentation and code folding purposes
-  logger.debug(f"Configuration Variables are ...")
   tmpVarA = os.environ.get("DEEPL_AUTH_KEY")
   tmpVarB = os.environ.get("DEEPL_SERVER_URL")
   tmpVarC = os.environ.get("DEEPL_TARGET_LANG")
@@ -547,31 +948,40 @@ if True:  # really just here for indentation and code folding purposes
   tmpVarE = os.environ.get("DEEPL_USAGE_RENEWAL_DAY")
   tmpVarF = os.getenv("ORIGINAL_BEFORE_TRANSLATION")
   tmpVarG = os.getenv("TRANSLATE_FILENAME")
-  targetLangShort = targetLang[0:2].lower()
-  # logger.debug(f"\tDEEPL_AUTH_KEY:          {tmpVarA}")
-  # logger.debug(f"\tauth_key:                {auth_key}")
-  logger.debug(f"\tDEEPL_SERVER_URL:            {tmpVarB}")
-  logger.debug(f"\t    serverURL:               {serverURL}")
-  logger.debug(f"\tDEEPL_TARGET_LANG:           {tmpVarC}")
-  logger.debug(f"\t    targetLang:              {targetLang}")
-  logger.debug(f"\t    targetLangShort:         {targetLangShort}")
-  logger.debug(f"\tCHECK_EVERY_X_MINUTES:       {tmpVarD}")
-  logger.debug(f"\t    checkPeriodMin:          {checkPeriodMin}")
-  logger.debug(f"\tDEEPL_USAGE_RENEWAL_DAY:     {tmpVarE}")
-  logger.debug(f"\t    usageRenewalDay:         {usageRenewalDay}")
-  logger.debug(f"\tORIGINAL_BEFORE_TRANSLATION: {tmpVarF}")
-  logger.debug(f"\t    isPutOrigFirst:          {isPutOrigFirst}")
-  logger.debug(f"\tTRANSLATE_FILENAME:           {tmpVarG}")
-  logger.debug(f"\t    isTransFilename:         {isPutOrigFirst}")
-  logger.debug(f"\tinputDir:       {inputDir}")
-  logger.debug(f"\toutputDir:      {outputDir}")
-  logger.debug(f"\tlogDir:         {logDir}")
-  logger.debug(f"\ttmpDir:         {tmpDir}")
-  logger.debug(f"")
-  logger.debug(f"\tScript name:             {__file__}")
-  logger.debug(f"\tScript version:          {scriptVersion}")
   thisFilesLastModDate = datetime.fromtimestamp(os.path.getmtime(__file__))
-  logger.debug(f"\tScript last modified:    {thisFilesLastModDate}")
+  # one multi-line record instead of one record per line, so the handlers are only run once
+  logger.debug("Configuration Variables are ...\n"
+               # "\tDEEPL_AUTH_KEY:          %s\n"
+               # "\tauth_key:                %s\n"
+               "\tDEEPL_SERVER_URL:            %s\n"
+               "\t    serverURL:               %s\n"
+               "\tDEEPL_TARGET_LANG:           %s\n"
+               "\t    targetLang:              %s\n"
+               "\t    targetLangShort:         %s\n"
+               "\tCHECK_EVERY_X_MINUTES:       %s\n"
+               "\t    checkPeriodMin:          %s\n"
+               "\tDEEPL_USAGE_RENEWAL_DAY:     %s\n"
+               "\t    usageRenewalDay:         %s\n"
+               "\tORIGINAL_BEFORE_TRANSLATION: %s\n"
+               "\t    isPutOrigFirst:          %s\n"
+               "\tTRANSLATE_FILENAME:          %s\n"
+               "\t    isTransFilename:         %s\n"
+               "\tinputDir:       %s\n"
+               "\toutputDir:      %s\n"
+               "\tlogDir:         %s\n"
+               "\ttmpDir:         %s\n"
+               "\n"
+               "\tScript name:             %s\n"
+               "\tScript version:          %s\n"
+               "\tScript last modified:    %s",
+               tmpVarB, serverURL,
+               tmpVarC, targetLang, targetLangShort,
+               tmpVarD, checkPeriodMin,
+               tmpVarE, usageRenewalDay,
+               tmpVarF, isPutOrigFirst,
+               tmpVarG, isTransFilename,
+               inputDir, outputDir, logDir, tmpDir,
+               __file__, scriptVersion, thisFilesLastModDate)
 
 # check that the directories are OK
 if not os.access(inputDir, os.W_OK): # need to write due to safe filename renaming
@@ -593,6 +1003,13 @@ if not os.access(logDir, os.W_OK): # a non-fatal error if you can't write logs
   logger.warning(f"Unable to write to log file directory!")
   logger.warning(f"\t{logDir}")
   logger.warning(f"Program will still continue, but this should be attended to.")
+try: # a non-fatal error if you can't cache translations, documents that show up twice are just translated twice
+  cacheDir = os.path.join(tmpDir, "cache")
+  os.makedirs(cacheDir, exist_ok=True)
+except OSError as error:
+  cacheDir = None # assign the None value if the cache directory failed
+  logger.warning(f"Unable to create the translation cache directory!")
+  logger.warning(f"\t{error}")
 
 
 # -------------------------------------------------------------
@@ -603,7 +1020,7 @@ try:
     logger.info(f"\tUsing custom Web API server: {serverURL}") # keep as INFO as it is such a rare occurrence that the event should be noted in the log
     translator = deepl.Translator(auth_key, server_url=serverURL)
   else:
-    logger.debug(f"\tUsing normal Web API server.")
+    logger.debug("\tUsing normal Web API server.")
     translator = deepl.Translator(auth_key)
 except Exception as error:
   logger.error(f"Critical error occurred when trying to establish communication with the Web API server.")
@@ -611,10 +1028,19 @@ except Exception as error:
   logger.error(f"\t{error}")
   exitProgram("Exiting program.")   # exit the program/loop
 
+# -------------------------------------------------------------
+# watch the input directory for new files (the 1st pass of the loop below picks up any files that arrived while we were down)
+newFileQueue = queue.Queue()
+try:
+  directoryObserver = startDirectoryObserver(inputDir, newFileQueue)
+except Exception as error:
+  directoryObserver = None # assign the None value if the observer failed, we will just re-scan every checkPeriodMin
+  logger.warning(f"Unable to watch the input directory for new files.  Falling back to re-scanning it every {checkPeriodMin} minute(s).")
+  logger.warning(f"\t{error}")
 
 # -------------------------------------------------------------
 # process any files in the directory
-logger.info(f'----------------------------------------') # added separator line to global log
+logger.info(logSeparator) # added separator line to global log
 while True: # loop forever
 
   # determine if there is any usage allowance left before moving on to processing files
@@ -638,87 +1064,42 @@ while True: # loop forever
       logger.warning(f"\t{error}")
 
   # get every PDF file in inputDir; send it off for translation; output the result in outputDir
-  for file in os.listdir(os.fsencode(inputDir)):
-      if wasQuotaExceeded:  # immediate exit out if the quota is exceeded
-        break
-
-      filename = os.fsdecode(file)
-      filename_orig = filename
-      if filename.lower().endswith(".pdf"): 
-
-        # clean the filename to avoid any un-safe chars that would prevent us from uploading the file to the web API
-        filename = getSafeFilename(filename)
-        if filename == "":  # a blank filename is the result a failed cleaning
-          # report the error and skip
-          logger.info(f'Processing file: {os.path.join(inputDir, os.fsdecode(file))}') # note the usage on the un-cleaned file name for this log entry
-          logger.error(f'Unable to properly clean the filename to allow uploading to the Web API.')
-          logger.error(f'Skipping file.')
-        else:
-          # create variables for all the files
-          inputFile  = os.path.join(inputDir, filename)
-          outputFile = os.path.join(outputDir, filename)
-          tmpFile    = os.path.join(tmpDir, filename)
-          logFile    = os.path.join(logDir,os.path.splitext(filename)[0] + '.log')
-          if isTransFilename:  # rename if we are using the translated filename instead of the safe one
-            outputFile = os.path.join(outputDir, getTranslatedFilename(filename_orig))
-          
-
-          # setup the individual (non-global) log file
-          try:
-            fileHandler = logging.FileHandler(logFile)
-            fileHandler.setLevel(logging.DEBUG)
-            fileHandler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)7s - %(message)s'))
-            logger.addHandler(fileHandler)
-          except Exception as error:
-            fileHandler = None # assign the None value if fileHandler failed
-            logger.warning(f"Unable to write to individual log file!")
-            logger.warning(f"\tIndividual Log file: {logFile}")
-            logger.warning(f"\t{error}")
-
-          # report start of processing
-          logger.info(f'Processing file: {os.path.join(inputDir, filename_orig)}') # note the usage on the un-cleaned file name for this log entry
-
-          # rename if we need the filename to be made safe/clean (if same name, exits the subroutine early)
-          renameToSafeFilename(inputDir, filename_orig, filename)
-
-          # translate the document
-          if (os.path.exists(inputFile) and allowFileTranslation):
-            translateDocument(inputFile, tmpFile, targetLang)
-          
-          # append the translated PDF to the original PDF and put in outputDir
-          if os.path.exists(tmpFile):
-            appendPDFs(inputFile, tmpFile, outputFile)
-          else:
-            logger.warning(f"Temporary file does not exist: {tmpFile}")
-
-          # clean up the old files, make sure that inputFiles aren't re-translated at another date
-          if (os.path.exists(outputFile) and allowFileDeletion): # if we successfully created the outputFile
-            deleteFile(tmpFile)
-            deleteFile(inputFile)
-
-          logger.info(f'Finished processing file.')
-          time.sleep(10) # Delay for X seconds to prevent pounding on the server & settling of the files.
-          # getUsage() # annoyingly DeepL doesn't update their usage quickly.  So, this line got  removed as worthless.
-          try:
-            if not (fileHandler is None):
-              logger.removeHandler(fileHandler) # close the log before moving on to the next file
-          except Exception as error:
-            logger.debug(f"Unable to close individual log file.  (Probably never opened in the 1st place.)")
-            logger.debug(f"\tIndividual Log file: {logFile}")
-            logger.debug(f"\t{error}")
-            
-          if allowToExitWithoutLoop:
-            exitProgram("Exiting program due to allowToExitWithoutLoop variable being set to True.")
-          else:
-            time.sleep(20) # Delay for X seconds to prevent pounding on the server.
-
-        logger.info(f'----------------------------------------') # added separator line to global log
-        continue # move to next file
-      else:
-        continue # move to next file
+  with os.scandir(inputDir) as entries: # list everything up front, the loop below renames files in inputDir
+    pdfFilenames = [entry.name for entry in entries if isWantedPDF(entry.name) and entry.is_file()] # is_file() uses the type cached by scandir(), no extra stat() per file
+  if isTransFilename:  # translate all the filenames in one go, rather than a web request per file
+    translatedFilenames = getTranslatedFilenames(pdfFilenames)
+  if allowToExitWithoutLoop: # testing, do the files one at a time and exit after the 1st one
+    for filename in pdfFilenames:
+      if processFile(filename):
+        exitProgram("Exiting program due to allowToExitWithoutLoop variable being set to True.")
+  else:
+    # two files that clean to the same safe filename would fight over the same tmpFile, so only the 1st one is processed this time around (the other is picked up by the next scan)
+    filenamesToProcess = {}
+    for filename in pdfFilenames:
+      filenamesToProcess.setdefault(getSafeFilename(filename) or filename, filename)
+    # translate several files at once, DeepL spends most of the time translating rather than us uploading/downloading
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=maxConcurrentFiles)
+    futures = [executor.submit(processFile, filename) for filename in filenamesToProcess.values()]
+    try:
+      for future in futures:
+        future.result() # re-raises any exception from the threads
+    except BaseException: # e.g., the SystemExit from handleSignal()
+      shutdownEvent.set() # the files already being processed don't start (or keep waiting on) any more translations
+      for future in futures:
+        future.cancel() # Python 3.7's shutdown() can't drop the queued files itself, they would all still be uploaded (& billed) before we could exit
+      executor.shutdown(wait=False)
+      raise
+    executor.shutdown()
+  if wasRateLimited: # DeepL said it was overloaded, back off before the next scan retries the files it didn't get to
+    wasRateLimited = False
+    sleepWithACountdown(rateLimitedSec)
+    continue # restart while loop
   # Delay for X minutes until checking the directory again ... and again ... and again.
   if not wasQuotaExceeded: # skip the delay if we're just going to delay for a much longer period due to exceeding the usage allowance
-    sleepWithACountdown(checkPeriodSec)
+    if directoryObserver is None:
+      sleepWithACountdown(checkPeriodSec)
+    else:
+      waitForNewFiles(checkPeriodSec)
       
 # #####################################
 # To Do
@@ -778,6 +1159,52 @@ while True: # loop forever
 #    * TRANSLATE_FILENAME:  added as ENV variable
 #    * filename_orig: lines 645, 661, 678, 681 preserves the original filename and replaces multiple calls to os.fsdecode(file)
 #    * tweaked the sleep() command to speed up non-Docker testing
+#
+# v2.3.0 2026-10-15
+#    * now imports watchdog to get told about new files in inputDir instead of only re-scanning it every CHECK_EVERY_X_MINUTES
+#    * NewPDFEventHandler, startDirectoryObserver(), waitForNewFiles(): added.  inotify (or a PollingObserver for NFS/CIFS shares) wakes the main loop up as soon as a PDF lands in inputDir
+#    * waitForFileToSettle(): added.  Waits until the file size stops changing so half-copied files aren't uploaded
+#    * getTranslatedFilenames(): added.  Translates all the filenames found in a scan with one web request (one filename per line) instead of one request per file, falls back to getTranslatedFilename() if the lines don't come back 1-for-1
+#    * translateText(): pulled the google/bing/deepl fallback chain out of getTranslatedFilename()
+#    * global log file: now written by a QueueListener thread (via a QueueHandler) so logging never blocks the main loop on disk I/O
+#    * flushGlobalLogQueue(): added.  Drains the queue before the global log's formatter is swapped
+#    * numbOfSecsTillRenewal(): dropped python-dateutil (relativedelta) for plain datetime/calendar month arithmetic.  Also fixes a crash when DEEPL_USAGE_RENEWAL_DAY is past the end of the current month (e.g., 31 in November)
+#    * getSafeFilename(): whitespace RegEx is compiled once and the Å/å/¢ replace() calls became one str.translate()
+#    * logger.debug(): switched from f-strings to %-style arguments, so the message is only built if a handler is going to use it
+#    * main loop: lists inputDir with os.scandir() instead of os.listdir(os.fsencode()), only PDF files are kept (directories named *.pdf are now skipped)
+#    * targetLangShort is set before (rather than inside) the debug dump block, as the filename translation uses it
+#    * individual log file: records are buffered in a MemoryHandler and written in bulk (immediately for ERRORs), and the FileHandler is now closed after each file instead of leaking its file descriptor
+#    * handleSignal(): added.  SIGTERM now unwinds the program via SystemExit so the queued log records get written out
+#    * updated the DockerFile to use the exec form of ENTRYPOINT, so the script (not /bin/sh) is PID 1 and actually receives the SIGTERM from `docker stop`
+#    * translators & langdetect are now imported on first use, so they are never loaded when TRANSLATE_FILENAME is off
+#    * detectLanguage(): added.  Replaces the duplicated langdetect try/except blocks
+#    * translateDocument(): the document ID & key come straight from error.document_handle.document_id/.document_key instead of a RegEx compiled on every error.  Also fixes a crash, .id/.key don't exist on DocumentHandle so the except block raised an AttributeError before it could set wasQuotaExceeded
+#    * getSafeFilename(): whitespace runs go straight to an underscore in one RegEx sub() (no intermediate space + replace())
+#    * getSafeFilename(): the valid chars are now a module level frozenset (safeChars) and filtered with a generator, instead of a lambda doing a substring scan of a string per char
+#    * main loop: dropped the os.path.exists() checks on inputFile/tmpFile/outputFile.  translateDocument() and appendPDFs() report a missing file themselves, and the files are only deleted if appendPDFs() says the merge worked (a half-written outputFile no longer counts as success)
+#    * isWantedPDF(): added.  The directory scan and the watchdog handler share one name-only check, and hidden files (e.g., macOS "._name.pdf" AppleDouble files) are skipped instead of being uploaded to DeepL
+#    * logSeparator: the global log's separator line is a constant instead of a literal f-string repeated 4 times
+#    * getFileHash(), getCachedTranslationName(), getCachedTranslation(), cacheTranslation(): added.  The last 20 translations are kept in tmpDir/cache (named by the SHA-256 of the original document + the target language), so a document that shows up again doesn't spend DeepL quota twice.  Only translations that merged are cached (copied in under a temporary name), and a cached translation that fails to merge is removed.  Least recently used are deleted first
+#    * getSafeFilename(): returns early if every char is already in safeChars, skipping the RegEx/translate()/unidecode()/filter passes
+#    * appendPDFs(): both PDFs are parsed into a PdfReader up front and the readers are appended, instead of handing pypdf the paths
+#    * getTranslatedFilenames(): filenames without any letters (e.g., "2024-01-31_0001.pdf") aren't sent to the translator, and translations are remembered (translatedFilenameCache) for files still sitting in the inputDir at the next scan
+#    * debug dump of the configuration variables is one multi-line logger.debug() call instead of 24.  Also fixes isTransFilename showing the value of isPutOrigFirst
+#    * sleepWithACountdown(): each tick sleeps until its point before a time.monotonic() deadline instead of a fixed time.sleep(delayPeriod), so the time spent logging doesn't pile up on top of the sleep
+#    * sleepWithACountdown(): the granularity table (countdownPeriods) and the days/hours/minutes constants are built once at module level instead of on every (recursive) call, and the granularity is picked with bisect instead of a linear search
+#    * to_bool(): lowercases the string once and tests it against set literals (frozenset constants) instead of tuples
+#    * sleepWithACountdown(): the countdown ticks only go to the console (the global log file filters out isCountdownTick records), so the log file is no longer written to every tick of a multi-day sleep and its NewLine/formatting isn't swapped around.  The sleep message now also says when the program will wake up
+#    * processFile(): the main loop's per-file code moved into a function, run by a ThreadPoolExecutor (maxConcurrentFiles = 4) so several files are translated at once.  The individual log files are fed by one permanent IndividualLogHandler that passes each record on by thread.  Files that clean to the same safe filename wait for the next scan
+#    * translateDocument(): uploads, polls (waitForDocumentTranslation(), backing off from 1s to 30s) and downloads as separate steps instead of translate_document_from_filepath() polling every 5s
+#    * getCharCountOfPDF(): counts the characters page by page instead of concatenating all the text, and only reads the first 5 pages of a PDF with more than 20 pages (extrapolating the rest)
+#    * getSafeFilename(): splits the filename with os.path.splitext() once instead of twice
+#    * sleepWithACountdown(): no longer calls itself to step down to a finer granularity, the loop just re-picks the granularity (isTop/deadline parameters removed)
+#    * processFile(): removed the fixed time.sleep(10) & time.sleep(20) after every file.  translateDocument() now catches deepl.TooManyRequestsException (raised after the deepl library's own retries) and sets wasRateLimited, the remaining files are skipped and the main loop backs off for rateLimitedSec before the next scan
+#    * deleteFile(): calls os.remove() straight away and catches FileNotFoundError, instead of an os.path.exists() check first.  Other errors are logged
+#    * renameToSafeFilename(): renames with os.link() + os.unlink(), so an existing file with the new name is detected by the link itself rather than a separate os.path.isfile() check.  Falls back to the check & os.rename() on filesystems without hard links
+#    * appendPDFs(): skips the blank pages of the translation while merging (getNonBlankPageNumbers()), so the translation is parsed once & the output written once.  Replaces removeBlankPDFPages(), which overwrote the PDF it was reading from, and raised an error if a blank page came before the first non-blank one (true_page_number was only set for non-blank pages), so no pages were removed from such a document.  Later blank pages were logged with the previous page's number.  A translation where every page is blank is kept whole (an empty PDF can't be appended).  The "not blank" lines are now debug level
+#    * getSafeFilename(): the final filter deletes the un-allowed chars with a single str.translate() (unsafeCharTable, built once) instead of a per-char generator
+#    * main loop: on SIGTERM (or any other exception) the files still queued for the thread pool are cancelled instead of all being uploaded before the program can exit.  shutdownEvent stops the running workers from starting an upload or polling any longer
+#    * waitForNewFiles(): ignores the observer events of the program's own safe filename renames (renamedInputFiles, only kept while an observer is running & emptied after each wait) and of files that are already gone, so a pass no longer wakes itself up with a false "New file detected"
 
 
 